@@ -1,10 +1,13 @@
 import os
 import sys
+import csv
+import json
 import time
 import logging
 import argparse
+import multiprocessing.util
+import cv2
 import numpy as np
-from PIL import Image
 import urllib.request
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -20,18 +23,63 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
 class CaptchaSolver:
+    _CACHE_MAX = 128
+
+    # Captcha geometry: 6 characters of 10x8 pixels laid out across the
+    # 70x20 image, nominally 11 pixels apart.
+    NUM_CHARS = 6
+    CHAR_STRIDE = 11
+
+    TEMPLATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  'templates.npy')
+
     def __init__(self):
         self.test_set = self._load_test_set()
         self.char_map = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
-        
+        # 0/255 uint8 copies of the templates for cv2.matchTemplate
+        self.templates_u8 = np.ascontiguousarray(self.test_set,
+                                                 dtype=np.uint8) * 255
+        # uint8 view of the character map so the result string is built
+        # with one fancy-index + decode instead of per-char str slicing
+        self.char_map_bytes = np.frombuffer(
+            self.char_map.encode('ascii'), np.uint8
+        )[:len(self.test_set)]
+        # Solutions keyed by a hash of the raw image bytes, so a repeated
+        # captcha skips preprocessing and matching entirely.
+        self._cache = {}
+        # Scratch buffer for the thresholded image, reused across solves
+        # to avoid a per-captcha allocation.
+        self._bool_buf = np.empty((20, 70), dtype=np.bool_)
+
     def _load_test_set(self):
         """
         Load character templates for pattern matching.
+
+        Templates are stored in templates.npy as an (N, 10, 8) bool
+        array and memory-mapped, so startup parses no literals and
+        worker processes share one read-only copy of the pages. The
+        file is rebuilt from the inline definitions if it is missing.
+        """
+        try:
+            return np.load(self.TEMPLATES_FILE, mmap_mode='r')
+        except (OSError, ValueError, EOFError):
+            templates = self._build_templates()
+            try:
+                np.save(self.TEMPLATES_FILE, templates)
+            except OSError as e:
+                logger.warning(f"Could not write {self.TEMPLATES_FILE}: {e}")
+            return templates
+
+    @staticmethod
+    def _build_templates():
+        """
+        Build the (N, 10, 8) template array from inline definitions.
         Each template is a 10x8 binary matrix representing a character.
         """
         templates = []
-        
+
         template_0 = np.array([
             [0, 1, 1, 1, 1, 1, 1, 0],
             [1, 1, 1, 1, 1, 1, 1, 1],
@@ -43,68 +91,78 @@ class CaptchaSolver:
             [1, 1, 0, 0, 0, 0, 1, 1],
             [1, 1, 1, 1, 1, 1, 1, 1],
             [0, 1, 1, 1, 1, 1, 1, 0]
-        ], dtype=np.uint8) * 255
-        
+        ], dtype=np.bool_)
+
         templates.append(template_0)
-        
-        return templates
-        
-    def _preprocess_image(self, image_path):
-        """Convert captcha image to binary matrix"""
+
+        return np.stack(templates, axis=0)
+
+    def _preprocess_image(self, image_bytes):
+        """Convert raw captcha image bytes to binary matrix"""
         try:
-            img = Image.open(image_path).convert('L')
-            img = img.resize((70, 20))
-            matrix = np.array(img)
+            buf = np.frombuffer(image_bytes, np.uint8)
+            gray = cv2.imdecode(buf, cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                raise ValueError("could not decode captcha image")
+            # NEAREST is effectively a memcpy; interpolation quality is
+            # wasted on an image we binarize immediately.
+            small = cv2.resize(gray, (70, 20), interpolation=cv2.INTER_NEAREST)
 
-            matrix = (matrix > 128) * 255
-            return matrix
+            np.greater(small, 128, out=self._bool_buf)
+            return self._bool_buf
         except Exception as e:
             logger.error(f"Error preprocessing image: {e}")
             raise
         
-    def _extract_character(self, matrix, position):
-        """Extract single character matrix (10x8) from position"""
-        try:
-            start_x = position * 10
-            char_matrix = matrix[:, start_x:start_x + 10]
-            return char_matrix
-        except Exception as e:
-            logger.error(f"Error extracting character at position {position}: {e}")
-            raise
-        
-    def _calculate_match_percentage(self, char_matrix, test_matrix):
-        """Calculate percentage match between character and test matrices"""
-        try:
-            matching_pixels = np.sum(char_matrix == test_matrix)
-            total_pixels = char_matrix.size
-            return (matching_pixels / total_pixels) * 100
-        except Exception as e:
-            logger.error(f"Error calculating match percentage: {e}")
-            raise
-        
-    def solve(self, captcha_path):
-        """Solve the captcha and return the result string"""
+    def solve(self, image_source):
+        """Solve the captcha and return the result string.
+
+        Accepts either a file path or raw PNG bytes.
+        """
         try:
-            matrix = self._preprocess_image(captcha_path)
-            result = []
-            
-            for i in range(6):
-                char_matrix = self._extract_character(matrix, i)
-                best_match = 0
-                best_char = ''
-                
-                for idx, test_matrix in enumerate(self.test_set):
-                    match_percent = self._calculate_match_percentage(char_matrix, test_matrix)
-                    if match_percent > best_match:
-                        best_match = match_percent
-                        best_char = self.char_map[idx]
-                
-                if best_match < 50:
-                    logger.warning(f"Low confidence match for character at position {i}")
-                
-                result.append(best_char)
-            
-            return ''.join(result)
+            if isinstance(image_source, (bytes, bytearray)):
+                image_bytes = bytes(image_source)
+            else:
+                with open(image_source, 'rb') as f:
+                    image_bytes = f.read()
+
+            key = hash(image_bytes)
+            if key in self._cache:
+                return self._cache[key]
+
+            matrix = self._preprocess_image(image_bytes)
+            image = matrix.astype(np.uint8) * 255
+
+            # Slide every template over the whole image with normalized
+            # cross-correlation; unlike fixed cell offsets this absorbs
+            # small glyph shifts. Shape: (N templates, 11, 63).
+            score_maps = np.stack([
+                cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+                for template in self.templates_u8
+            ])
+
+            # Peak per character position: each of the 6 x-bins allows
+            # the match to land within +/-1 column of its nominal offset.
+            width = score_maps.shape[2]
+            best = np.empty(self.NUM_CHARS, dtype=np.int64)
+            confidence = np.empty(self.NUM_CHARS)
+            for p in range(self.NUM_CHARS):
+                lo = max(0, p * self.CHAR_STRIDE - 1)
+                hi = min(width, p * self.CHAR_STRIDE + 2)
+                peaks = score_maps[:, :, lo:hi].max(axis=(1, 2))
+                best[p] = peaks.argmax()
+                confidence[p] = peaks.max() * 100
+
+            for i in np.flatnonzero(confidence < 50):
+                logger.warning(f"Low confidence match for character at position {i}")
+
+            result = self.char_map_bytes[best].tobytes().decode('ascii')
+
+            if len(self._cache) >= self._CACHE_MAX:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[key] = result
+
+            return result
         except Exception as e:
             logger.error(f"Error solving captcha: {e}")
             raise
@@ -112,10 +170,17 @@ class CaptchaSolver:
 class AUInfoExtractor:
     def __init__(self):
         self.captcha_solver = CaptchaSolver()
+        self.driver = None
         self.base_url = "https://coe.annauniv.edu"
         self.login_url = f"{self.base_url}/login.php"
         self.marks_url = f"{self.base_url}/student/marks.php"
-        
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def setup_driver(self):
         """Setup Chrome WebDriver with appropriate options"""
         try:
@@ -124,41 +189,72 @@ class AUInfoExtractor:
             chrome_options.add_argument('--no-sandbox')
             chrome_options.add_argument('--disable-dev-shm-usage')
             chrome_options.add_argument('--disable-gpu')
-            
+            chrome_options.add_argument('--disable-extensions')
+            # Proceed on DOMContentLoaded instead of waiting for full load
+            chrome_options.page_load_strategy = 'eager'
+
             driver = webdriver.Chrome(options=chrome_options)
-            driver.implicitly_wait(10)
+
+            # Skip downloading page images; none are read by the scraper
+            # except the captcha. CDP URL patterns cannot express "except
+            # *captcha*", so block the common static image types and
+            # leave PNG alone in case the captcha is served as one.
+            try:
+                driver.execute_cdp_cmd('Network.enable', {})
+                driver.execute_cdp_cmd('Network.setBlockedURLs', {
+                    'urls': ['*.jpg', '*.jpeg', '*.gif', '*.ico', '*.svg', '*.webp']
+                })
+            except WebDriverException as e:
+                logger.warning(f"Could not block image URLs via CDP: {e}")
+
             return driver
         except Exception as e:
             logger.error(f"Error setting up WebDriver: {e}")
             raise
-        
+
+    def _get_driver(self):
+        """Return the shared WebDriver, creating it on first use"""
+        if self.driver is None:
+            self.driver = self.setup_driver()
+        return self.driver
+
+    def close(self):
+        """Shut down the shared WebDriver if one was created"""
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
+
     def login(self, driver, username, password, max_retries=3):
         """Handle login process including captcha solving"""
         for attempt in range(max_retries):
             try:
                 logger.info(f"Login attempt {attempt + 1}/{max_retries}")
+                # The driver persists across extract_info calls (and users
+                # in batch mode), so always start from a cookie-less state
+                # lest a live session redirect us away from the login form.
+                driver.delete_all_cookies()
                 driver.get(self.login_url)
                 
-                WebDriverWait(driver, 10).until(
+                WebDriverWait(driver, 10, poll_frequency=0.2).until(
                     EC.presence_of_element_located((By.NAME, "username"))
                 )
-                
+
                 captcha_elem = driver.find_element(By.ID, "captchaImage")
-                captcha_path = f"temp_captcha_{attempt}.png"
-                captcha_elem.screenshot(captcha_path)
-                
-                captcha_solution = self.captcha_solver.solve(captcha_path)
+                captcha_solution = self.captcha_solver.solve(captcha_elem.screenshot_as_png)
                 logger.info(f"Captcha solution: {captcha_solution}")
-            
-            
-                driver.find_element(By.NAME, "username").send_keys(username)
-                driver.find_element(By.NAME, "password").send_keys(password)
-                driver.find_element(By.NAME, "captcha").send_keys(captcha_solution)
-                
-                driver.find_element(By.NAME, "login").click()
-                
 
-                WebDriverWait(driver, 5).until(
+                # Fill all three fields and submit in one round-trip to the
+                # browser instead of four separate WebDriver commands.
+                driver.execute_script(
+                    "document.getElementsByName('username')[0].value = arguments[0];"
+                    "document.getElementsByName('password')[0].value = arguments[1];"
+                    "document.getElementsByName('captcha')[0].value = arguments[2];"
+                    "document.getElementsByName('login')[0].click();",
+                    username, password, captcha_solution
+                )
+
+
+                WebDriverWait(driver, 5, poll_frequency=0.2).until(
                     EC.presence_of_element_located((By.CLASS_NAME, "dashboard"))
                 )
                 
@@ -176,11 +272,7 @@ class AUInfoExtractor:
                 if attempt == max_retries - 1:
                     raise
                 continue
-                
-            finally:
-                if os.path.exists(captcha_path):
-                    os.remove(captcha_path)
-        
+
         return False
     
     def extract_marks(self, driver, semester=None):
@@ -196,27 +288,23 @@ class AUInfoExtractor:
                 semester_option.click()
             
            
-            WebDriverWait(driver, 10).until(
+            WebDriverWait(driver, 10, poll_frequency=0.2).until(
                 EC.presence_of_element_located((By.CLASS_NAME, "marks-table"))
             )
             
-           
-            marks_table = driver.find_element(By.CLASS_NAME, "marks-table")
-            rows = marks_table.find_elements(By.TAG_NAME, "tr")
-            
-            marks_data = []
-            for row in rows[1:]:  
-                cols = row.find_elements(By.TAG_NAME, "td")
-                subject_data = {
-                    "code": cols[0].text,
-                    "name": cols[1].text,
-                    "internal": cols[2].text,
-                    "external": cols[3].text,
-                    "total": cols[4].text,
-                    "result": cols[5].text
-                }
-                marks_data.append(subject_data)
-            
+            # Dump the whole table in one round-trip instead of issuing
+            # six WebDriver calls per subject row.
+            rows = driver.execute_script(
+                "return Array.from(document.querySelectorAll('.marks-table tr'))"
+                ".slice(1).map(function(r) {"
+                "    return Array.from(r.querySelectorAll('td'))"
+                "        .map(function(c) { return c.innerText; });"
+                "});"
+            )
+
+            fields = ("code", "name", "internal", "external", "total", "result")
+            marks_data = [dict(zip(fields, cols)) for cols in rows]
+
             return marks_data
             
         except Exception as e:
@@ -225,41 +313,108 @@ class AUInfoExtractor:
     
     def extract_info(self, username, password, semester=None):
         """Main method to extract student information"""
-        driver = None
         try:
-            driver = self.setup_driver()
-            
+            driver = self._get_driver()
+
             if not self.login(driver, username, password):
                 raise Exception("Failed to login after maximum retries")
-            
+
             marks_data = self.extract_marks(driver, semester)
             return marks_data
-            
+
         except Exception as e:
             logger.error(f"Error in information extraction: {e}")
             raise
-            
-        finally:
-            if driver:
-                driver.quit()
+
+# One extractor (and one Chrome) per worker process; WebDriver instances
+# are not thread-safe but independent processes are fine.
+_worker_extractor = None
+
+
+def _worker_init():
+    """Create the per-process AUInfoExtractor for the pool workers"""
+    global _worker_extractor
+    _worker_extractor = AUInfoExtractor()
+    # Quit the worker's Chrome when the worker exits. Forked pool
+    # workers leave via os._exit(), which skips atexit handlers, but
+    # multiprocessing runs registered finalizers first.
+    multiprocessing.util.Finalize(None, _worker_extractor.close, exitpriority=0)
+
+
+def _scrape_one(task):
+    """Scrape a single (username, password, semester) task in a worker"""
+    username, password, semester = task
+    try:
+        marks = _worker_extractor.extract_info(username, password, semester)
+        return {"username": username, "marks": marks}
+    except Exception as e:
+        logger.error(f"Error scraping {username}: {e}")
+        return {"username": username, "error": str(e)}
+
+
+def scrape_users(users_file, default_semester=None):
+    """Scrape every user in a CSV file with a pool of worker processes.
+
+    Each row is username,password[,semester]; workers own independent
+    Chrome instances, so scraping scales with the pool size.
+    """
+    tasks = []
+    with open(users_file, newline='') as f:
+        for lineno, row in enumerate(csv.reader(f), start=1):
+            if not row:
+                continue
+            if len(row) < 2:
+                logger.warning(
+                    f"Skipping malformed row at {users_file}:{lineno}: "
+                    "expected username,password[,semester]"
+                )
+                continue
+            semester = row[2] if len(row) > 2 and row[2] else default_semester
+            tasks.append((row[0], row[1], semester))
+
+    if not tasks:
+        return []
+
+    workers = min(len(tasks), max(1, (os.cpu_count() or 2) // 2))
+    pool = multiprocessing.Pool(processes=workers, initializer=_worker_init)
+    try:
+        return pool.map(_scrape_one, tasks)
+    finally:
+        # close + join (the Pool context manager calls terminate(), which
+        # SIGTERMs workers before their atexit hooks can quit Chrome)
+        pool.close()
+        pool.join()
+
 
 def main():
     parser = argparse.ArgumentParser(description='AU Student Information Extraction Tool')
-    parser.add_argument('--username', required=True, help='Your login username')
-    parser.add_argument('--password', required=True, help='Your login password')
+    parser.add_argument('--username', help='Your login username')
+    parser.add_argument('--password', help='Your login password')
     parser.add_argument('--semester', help='Specific semester to fetch marks for')
+    parser.add_argument('--users-file', help='CSV of username,password[,semester] rows to scrape in parallel')
     parser.add_argument('--output', help='Output file path for marks data')
-    
+
     args = parser.parse_args()
-    
+
+    if not args.users_file and not (args.username and args.password):
+        parser.error('--username and --password are required unless --users-file is given')
+
     try:
-        extractor = AUInfoExtractor()
-        marks_data = extractor.extract_info(args.username, args.password, args.semester)
-        
+        if args.users_file:
+            results = scrape_users(args.users_file, args.semester)
+            if args.output:
+                with open(args.output, 'w') as f:
+                    json.dump(results, f, indent=2)
+                logger.info(f"Marks data saved to {args.output}")
+            else:
+                print(json.dumps(results, indent=2))
+            return
+
+        with AUInfoExtractor() as extractor:
+            marks_data = extractor.extract_info(args.username, args.password, args.semester)
+
         if marks_data:
             if args.output:
-                
-                import json
                 with open(args.output, 'w') as f:
                     json.dump(marks_data, f, indent=2)
                 logger.info(f"Marks data saved to {args.output}")